@@ -1,33 +1,137 @@
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import csv
+import functools
 import os
-import random
+import re
 import string
-import uuid
 from datetime import datetime, timedelta
 
 # -------------------------- Mock Data Generation -------------------------- #
 
 
-def generate_random_email():
-    """Generate a random email address."""
-    domains = ['example.com', 'test.com', 'mail.com', 'demo.org']
-    name_length = random.randint(5, 10)
-    name = ''.join(random.choices(string.ascii_lowercase, k=name_length))
-    domain = random.choice(domains)
-    return f"{name}@{domain}"
+def generate_random_emails(n):
+    """Generate n random email addresses."""
+    domains = np.array(['example.com', 'test.com', 'mail.com', 'demo.org'])
+    letters = np.frombuffer(string.ascii_lowercase.encode(), dtype='S1')
+    name_ends = np.cumsum(np.random.randint(5, 11, n)).tolist()
+    # Draw the letters of all names as one stream and slice it per address
+    chars = np.random.choice(letters, name_ends[-1] if n else 0).tobytes().decode()
+    picked_domains = np.random.choice(domains, n).tolist()
+    return [f"{chars[start:end]}@{domain}"
+            for start, end, domain in zip([0] + name_ends, name_ends, picked_domains)]
 
 
-def generate_random_reference():
-    """Generate a random UUID as a transaction reference."""
-    return str(uuid.uuid4())
+def generate_random_references(n):
+    """Generate n random UUID4 strings as transaction references."""
+    # One urandom call for the whole batch instead of one per uuid4()
+    raw = np.frombuffer(os.urandom(16 * n), dtype=np.uint8)
+    raw = raw.reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    digits = raw.tobytes().hex()
+    return [f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+            for h in (digits[i:i + 32] for i in range(0, 32 * n, 32))]
 
 
-def generate_random_transaction_date():
-    """Generate a random transaction date within the past year."""
-    start_date = datetime.now() - timedelta(days=365)
-    random_days = random.randint(0, 365)
-    random_date = start_date + timedelta(days=random_days)
-    return random_date.strftime('%d.%m.%Y')
+@functools.lru_cache(maxsize=1)
+def _transaction_date_lut():
+    """Return every date of the past year, formatted once per run."""
+    now = datetime.now()
+    return np.array([(now - timedelta(days=365 - i)).strftime('%d.%m.%Y')
+                     for i in range(366)])
+
+
+def generate_random_transaction_dates(n):
+    """Generate n random transaction dates within the past year."""
+    return np.take(_transaction_date_lut(), np.random.randint(0, 366, n))
+
+# -------------------------- CSV Reading -------------------------- #
+
+# Cell values read as missing; the same defaults pandas' read_csv uses
+csv_na_values = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN',
+                 '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA',
+                 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def read_csv_file(file_path, encoding, usecols=None):
+    """Read a CSV file with the pyarrow parser, keeping every column as text.
+
+    Column names are trimmed and lowercased. If usecols is given, only those
+    columns are parsed; all other columns are skipped by the parser.
+    """
+    # Read the header ourselves so the names are normalized once, up front
+    with open(file_path, encoding=encoding, newline='') as f:
+        header = [name.lstrip('\ufeff').strip().lower()
+                  for name in next(csv.reader(f))]
+    columns = header if usecols is None else [
+        name for name in header if name in usecols]
+    table = pacsv.read_csv(
+        file_path,
+        read_options=pacsv.ReadOptions(
+            encoding=encoding, column_names=header, skip_rows=1),
+        # Quoted values (e.g. product names) may contain line breaks
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            # Force string columns so GTINs and SKUs keep their leading zeros
+            column_types={name: pa.string() for name in columns},
+            null_values=csv_na_values,
+            strings_can_be_null=True
+        )
+    )
+    return table
+
+
+def validate_columns(table, required_columns, file_path):
+    """Raise a ValueError if the table lacks any of the required columns."""
+    missing = required_columns.difference(table.column_names)
+    if missing:
+        raise ValueError(f"Missing columns in '{file_path}': {set(missing)}")
+
+# -------------------------- CSV Writing -------------------------- #
+
+
+def write_csv_file(table, file_path, delimiter=';'):
+    """Write a table of text columns as UTF-8 CSV, quoting values only when needed.
+
+    The output matches pandas' to_csv: the header is unquoted and a value is
+    quoted only if it contains the delimiter, a double quote or a line break.
+    """
+    needs_quoting = f'[{re.escape(delimiter)}"\r\n]'
+    write_options = pacsv.WriteOptions(
+        include_header=False, delimiter=delimiter, quoting_style='none')
+    # 1 MiB buffer to keep the number of write calls low; rows are written in
+    # batches so only one batch is formatted in memory at a time
+    with pa.output_stream(file_path, buffer_size=1024 * 1024) as sink, \
+            pacsv.CSVWriter(sink, table.schema, write_options=write_options) as writer:
+        sink.write((delimiter.join(table.column_names) + '\n').encode('utf-8'))
+        for batch in table.to_batches(max_chunksize=65536):
+            columns = []
+            needs_quotes = False
+            for column in batch.columns:
+                quote_mask = pc.match_substring_regex(column, needs_quoting)
+                if pc.any(quote_mask).as_py():
+                    quoted = pc.binary_join_element_wise(
+                        '"', pc.replace_substring(column, '"', '""'), '"', '')
+                    column = pc.if_else(quote_mask, quoted, column)
+                    needs_quotes = True
+                columns.append(column)
+            if not needs_quotes:
+                # CSVWriter writes the batch to the sink before returning, so
+                # its output stays in order with the lines written below
+                writer.write_batch(batch)
+                continue
+            # pyarrow's writer cannot quote only some values, so batches that
+            # need quoting are formatted with compute functions instead
+            lines = pc.binary_join_element_wise(*columns, delimiter)
+            lines = pc.binary_join_element_wise(lines, '', '\n')
+            # Concatenate the lines so the batch is written with a single call
+            text = pc.binary_join(
+                pa.ListArray.from_arrays([0, len(lines)], lines), '')
+            sink.write(text[0].as_buffer())
 
 # -------------------------- File Paths -------------------------- #
 
@@ -37,6 +141,14 @@ gtin_sku_file = 'gtin_sku_from_customer.csv'
 metabase_file = 'metabase_product_export.csv'
 output_file = 'ready-to-review-collector.csv'
 
+# Set to True to list every SKU without a customer GTIN instead of a count
+verbose = False
+
+# Columns used from each input file
+required_gtin_sku_cols = frozenset({'gtin', 'sku'})
+required_metabase_cols = frozenset({'sku', 'gtin',
+                                    'name', 'url', 'image_url', 'mpn', 'brand'})
+
 # Check if input files exist
 if not os.path.exists(gtin_sku_file):
     raise FileNotFoundError(f"The file '{gtin_sku_file}' does not exist.")
@@ -47,111 +159,108 @@ if not os.path.exists(metabase_file):
 
 # Read gtin_sku_from_customer.csv
 try:
-    gtin_sku_df = pd.read_csv(gtin_sku_file, dtype=str,
-                              encoding='utf-8')  # Assuming UTF-8
-    # Trim whitespace from headers
-    gtin_sku_df.rename(columns=lambda x: x.strip(), inplace=True)
+    gtin_sku_table = read_csv_file(gtin_sku_file, encoding='utf-8',  # Assuming UTF-8
+                                   usecols=required_gtin_sku_cols)
 except Exception as e:
     raise Exception(f"Error reading '{gtin_sku_file}': {e}")
 
 # Validate required columns in gtin_sku_from_customer.csv
-required_gtin_sku_cols = {'gtin', 'sku'}
-if not required_gtin_sku_cols.issubset(gtin_sku_df.columns.str.lower()):
-    missing = required_gtin_sku_cols - set(gtin_sku_df.columns.str.lower())
-    raise ValueError(f"Missing columns in '{gtin_sku_file}': {missing}")
-
-# Normalize column names to lowercase for consistency
-gtin_sku_df.columns = gtin_sku_df.columns.str.lower()
+validate_columns(gtin_sku_table, required_gtin_sku_cols, gtin_sku_file)
 
 # Read metabase_product_export.csv with specified encoding
 try:
     # Replace with detected encoding if necessary
-    metabase_df = pd.read_csv(metabase_file, dtype=str, encoding='ISO-8859-1')
-    # Trim whitespace from headers
-    metabase_df.rename(columns=lambda x: x.strip(), inplace=True)
+    metabase_table = read_csv_file(metabase_file, encoding='ISO-8859-1',
+                                   usecols=required_metabase_cols)
 except Exception as e:
     raise Exception(f"Error reading '{metabase_file}': {e}")
 
 # Validate required columns in metabase_product_export.csv
-required_metabase_cols = {'sku', 'gtin',
-                          'name', 'url', 'image_url', 'mpn', 'brand'}
-if not required_metabase_cols.issubset(metabase_df.columns.str.lower()):
-    missing = required_metabase_cols - set(metabase_df.columns.str.lower())
-    raise ValueError(f"Missing columns in '{metabase_file}': {missing}")
-
-# Normalize column names to lowercase for consistency
-metabase_df.columns = metabase_df.columns.str.lower()
-
-# -------------------------- Merge DataFrames -------------------------- #
-
-# Merge the two DataFrames on 'sku' to ensure correct GTIN assignment
-merged_df = pd.merge(
-    metabase_df,
-    gtin_sku_df[['sku', 'gtin']],
-    on='sku',
-    how='left',
-    suffixes=('_metabase', '_customer')
-)
+validate_columns(metabase_table, required_metabase_cols, metabase_file)
+
+# -------------------------- Merge Tables -------------------------- #
+
+# Empty SKUs are joined as '' so they still match each other, and row
+# numbers are kept so the metabase order can be restored after the join
+metabase_table = metabase_table.set_column(
+    metabase_table.column_names.index('sku'), 'sku',
+    pc.fill_null(metabase_table['sku'], ''))
+metabase_table = metabase_table.append_column(
+    '_metabase_row', pa.array(np.arange(metabase_table.num_rows)))
+gtin_sku_table = pa.table({
+    'sku': pc.fill_null(gtin_sku_table['sku'], ''),
+    'gtin': gtin_sku_table['gtin'],
+    '_customer_row': pa.array(np.arange(gtin_sku_table.num_rows))
+})
+
+# Join the two tables on 'sku' to ensure correct GTIN assignment
+merged_table = metabase_table.join(
+    gtin_sku_table,
+    keys='sku',
+    join_type='left outer',
+    left_suffix='_metabase',
+    right_suffix='_customer'
+).sort_by([('_metabase_row', 'ascending'), ('_customer_row', 'ascending')])
 
 # Check for SKUs in metabase_export that do not have a corresponding GTIN in customer file
-missing_gtins = merged_df[merged_df['gtin_customer'].isnull()]
-if not missing_gtins.empty:
+missing_gtin_count = merged_table['gtin_customer'].null_count
+if missing_gtin_count and verbose:
     print("Warning: The following SKUs from 'metabase_product_export.csv' do not have corresponding GTINs in 'gtin_sku_from_customer.csv':")
-    print(missing_gtins[['sku', 'name']])
+    missing_gtins = merged_table.filter(
+        pc.is_null(merged_table['gtin_customer']))
+    for sku, name in zip(missing_gtins['sku'].to_pylist(),
+                         missing_gtins['name'].to_pylist()):
+        print(f"{sku}\t{name}")
     # Optionally handle missing GTINs here
+elif missing_gtin_count:
+    print(f"Warning: {missing_gtin_count} SKUs from 'metabase_product_export.csv' do not have corresponding GTINs in 'gtin_sku_from_customer.csv' (set verbose = True to list them).")
 
 # Replace the GTIN in metabase data with the customer's GTIN
-merged_df['final_gtin'] = merged_df['gtin_customer'].combine_first(
-    merged_df['gtin_metabase'])
+final_gtin = pc.coalesce(merged_table['gtin_customer'],
+                         merged_table['gtin_metabase'])
+
+# Keep only the columns needed for the final file and release the inputs
+merged_table = merged_table.select(
+    ['sku', 'name', 'url', 'image_url', 'brand', 'mpn'])
+del metabase_table, gtin_sku_table
 
-# -------------------------- Prepare Final DataFrame -------------------------- #
+# -------------------------- Prepare Final Table -------------------------- #
 
-# Initialize customer-related fields with mocked data
-final_df = pd.DataFrame({
+# Initialize customer-related fields with mocked data; the columns are
+# listed in the order expected in the output file
+row_count = merged_table.num_rows
+final_table = pa.table({
     # Mocked random emails
-    'email': [generate_random_email() for _ in range(len(merged_df))],
+    'email': generate_random_emails(row_count),
     # Mocked random transaction IDs
-    'reference': [generate_random_reference() for _ in range(len(merged_df))],
+    'reference': generate_random_references(row_count),
     # Mocked first names
-    'firstName': ['MockFirstName' for _ in range(len(merged_df))],
+    'firstName': pa.repeat('MockFirstName', row_count),
     # Mocked last names
-    'lastName': ['MockLastName' for _ in range(len(merged_df))],
+    'lastName': pa.repeat('MockLastName', row_count),
     # Mocked dates
-    'transactionDate': [generate_random_transaction_date() for _ in range(len(merged_df))],
-    'productName': merged_df['name'],
-    'productSku': merged_df['sku'],
-    'productUrl': merged_df['url'],
-    'productImageUrl': merged_df['image_url'],
-    'productBrand': merged_df['brand'],
-    'productGtin': merged_df['final_gtin'],
-    'productMpn': merged_df['mpn']
+    'transactionDate': generate_random_transaction_dates(row_count),
+    'productName': merged_table['name'],
+    'productSku': merged_table['sku'],
+    'productUrl': merged_table['url'],
+    'productImageUrl': merged_table['image_url'],
+    'productBrand': merged_table['brand'],
+    'productGtin': final_gtin,
+    'productMpn': merged_table['mpn']
 })
 
-# Replace any NaN values with empty strings
-final_df.fillna('', inplace=True)
-
-# Reorder columns to match the desired output
-final_df = final_df[[
-    'email',
-    'reference',
-    'firstName',
-    'lastName',
-    'transactionDate',
-    'productName',
-    'productSku',
-    'productUrl',
-    'productImageUrl',
-    'productBrand',
-    'productGtin',
-    'productMpn'
-]]
+# Replace missing values with empty strings; null_count is stored with each
+# column, so columns without nulls (e.g. the mocked ones) are skipped
+for i, name in enumerate(final_table.column_names):
+    if final_table.column(i).null_count:
+        final_table = final_table.set_column(
+            i, name, pc.fill_null(final_table.column(i), ''))
 
 # -------------------------- Save to CSV -------------------------- #
 
-# Save to CSV with semicolon delimiter
+# Save to CSV with semicolon delimiter (UTF-8)
 try:
-    final_df.to_csv(output_file, sep=';', index=False, encoding='utf-8')
-    print(f"Import file '{
-          output_file}' has been created successfully with mocked data.")
+    write_csv_file(final_table, output_file, delimiter=';')
+    print(f"Import file '{output_file}' has been created successfully with mocked data.")
 except Exception as e:
     raise Exception(f"Error writing to '{output_file}': {e}")